@@ -2,10 +2,9 @@ from __future__ import annotations
 import logging
 import os
 import re
-import subprocess
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
@@ -17,11 +16,52 @@ CORPUS_DIR = (BASE_DIR / "corpus").resolve()
 ALLOWED_EXTENSIONS = {".cpp"}
 MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10 MB per request
 PER_FILE_MAX = 10 * 1024 * 1024  # 10 MB per file
-SUBPROCESS_TIMEOUT = 120  # seconds for plagiarism check subprocess
+FILE_THRESHOLD = 0.3  # lower than the CLI default to make similarities easier to spot
+
+try:
+    from .main import (
+        DEFAULT_ASSIGNMENT_THRESHOLD,
+        DEFAULT_IGNORES,
+        Fingerprints,
+        _fingerprint_one,
+        collect_assignments,
+        compare_assignments,
+    )
+    from .shingle import DEFAULT_K
+    from .winnow import DEFAULT_W
+except ImportError:  # run as a plain script: python src/app.py
+    sys.path.insert(0, str(BASE_DIR))
+    from src.main import (
+        DEFAULT_ASSIGNMENT_THRESHOLD,
+        DEFAULT_IGNORES,
+        Fingerprints,
+        _fingerprint_one,
+        collect_assignments,
+        compare_assignments,
+    )
+    from src.shingle import DEFAULT_K
+    from src.winnow import DEFAULT_W
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger("plagiarism_service")
 
+# Fingerprints of already-seen files, keyed by path with an (mtime, size)
+# stamp — repeated /api/check calls after incremental uploads only
+# re-fingerprint new or changed files.
+_FP_CACHE: Dict[str, Tuple[Tuple[float, int], Fingerprints]] = {}
+
+
+def _fingerprint_cached(fpath: Path, k: int, w: int) -> Tuple[str, Fingerprints]:
+    st = fpath.stat()
+    key = str(fpath)
+    stamp = (st.st_mtime, st.st_size)
+    hit = _FP_CACHE.get(key)
+    if hit is not None and hit[0] == stamp:
+        return key, hit[1]
+    fid, fps = _fingerprint_one(fpath, k, w)
+    _FP_CACHE[key] = (stamp, fps)
+    return fid, fps
+
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
@@ -104,86 +144,54 @@ def create_app() -> Flask:
         assignment_dirs = [d for d in CORPUS_DIR.iterdir() if d.is_dir()]
         for d in assignment_dirs:
             files = list(d.glob("*.cpp"))
-            logger.info("Assignment %s contains %d .cpp files: %s", 
+            logger.info("Assignment %s contains %d .cpp files: %s",
                        d.name, len(files), [f.name for f in files])
 
-        # Add Backend directory to Python path for module imports
-        env = os.environ.copy()
-        src_dir = Path(__file__).parent  # Get the src directory containing main.py
-        env["PYTHONPATH"] = str(BASE_DIR)  # Set to Backend directory
-        
-        cmd = [
-            sys.executable,  # Use the same Python interpreter
-            "-m",
-            "src.main",     # Use the module path relative to Backend directory
-            "--corpus",
-            str(CORPUS_DIR),
-            "--show-details",
-            "--file-threshold",
-            "0.3",          # Lower threshold to make it easier to detect similarities
-        ]
-        logger.info("Running check with command: %s", " ".join(cmd))
-        logger.info("Working directory: %s", BASE_DIR)
-        logger.info("PYTHONPATH: %s", env["PYTHONPATH"])
-
+        # Run the pipeline in-process: no interpreter startup, no re-import of
+        # numpy/numba per request, and fingerprints are cached across requests.
         try:
-            # Set explicit encoding and error handler for subprocess
-            logger.info("About to run plagiarism check:")
-            logger.info("  Command: %s", " ".join(cmd))
-            logger.info("  Working dir: %s", BASE_DIR)
-            logger.info("  PYTHONPATH: %s", env["PYTHONPATH"])
-            
-            proc = subprocess.run(
-                cmd,
-                cwd=str(BASE_DIR),
-                env=env,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                check=False,
-                timeout=SUBPROCESS_TIMEOUT,
+            assignments = collect_assignments(CORPUS_DIR, set(DEFAULT_IGNORES))
+            file_fps: Dict[str, Fingerprints] = {}
+            for files in assignments.values():
+                for fpath in files:
+                    fid, fps = _fingerprint_cached(fpath, DEFAULT_K, DEFAULT_W)
+                    file_fps[fid] = fps
+            results = compare_assignments(
+                assignments,
+                file_fps,
+                file_threshold=FILE_THRESHOLD,
+                assignment_threshold=DEFAULT_ASSIGNMENT_THRESHOLD,
+                show_details=True,
             )
-        except subprocess.TimeoutExpired:
-            return jsonify({"error": "Plagiarism check timed out"}), 504
         except Exception as e:
             logger.exception("Failed to run plagiarism check: %s", e)
             return jsonify({"error": f"Failed to run plagiarism check: {e}"}), 500
 
-        stdout = proc.stdout or ""
-        stderr = proc.stderr or ""
-        if proc.returncode != 0:
-            logger.error("Plagiarism check failed with code %d", proc.returncode)
-            logger.error("STDERR: %s", stderr)
-            logger.error("STDOUT: %s", stdout)
-            return jsonify({
-                "error": "Plagiarism check failed", 
-                "stderr": stderr, 
-                "stdout": stdout,
-                "returncode": proc.returncode
-            }), 500
-
-        parsed = parse_main_output(stdout)
-
-        # 🔥 NEW SECTION — Identify Most Plagiarized Pair
-        top_pair = None
-        max_similarity = 0.0
-        for d in parsed.get("details", []):
-            for rec in d.get("topAtoB", []):
-                if rec["similarityPct"] > max_similarity:
-                    max_similarity = rec["similarityPct"]
-                    top_pair = (rec["left"], rec["right"])
-            for rec in d.get("topBtoA", []):
-                if rec["similarityPct"] > max_similarity:
-                    max_similarity = rec["similarityPct"]
-                    top_pair = (rec["left"], rec["right"])
-
+        parsed = {
+            "details": [
+                {
+                    "pair": list(d["pair"]),
+                    "topAtoB": d["topAtoB"],
+                    "topBtoA": d["topBtoA"],
+                }
+                for d in results["details"]
+            ],
+            "suspiciousPairs": [list(p) for p in results["suspiciousPairs"]],
+        }
+
+        # 🔥 Identify Most Plagiarized Pair — one max() over the flattened records
+        all_recs = (
+            (rec["similarityPct"], rec["left"], rec["right"])
+            for d in parsed.get("details", [])
+            for rec in (*d.get("topAtoB", ()), *d.get("topBtoA", ()))
+        )
+        top = max(all_recs, key=lambda t: t[0], default=None)
         parsed["mostPlagiarized"] = {
-            "pair": top_pair,
-            "similarity": round(max_similarity, 2),
-        } if top_pair else None
+            "pair": [top[1], top[2]],
+            "similarity": round(top[0], 2),
+        } if top is not None and top[0] > 0 else None
 
-        return jsonify({"stdout": stdout, "results": parsed})
+        return jsonify({"results": parsed})
 
     # -----------------------------------------
     # ✅ CLEANUP ENDPOINT (as-is)
@@ -211,74 +219,6 @@ def create_app() -> Flask:
 
     return app
 
-# -----------------------------------------
-# ✅ PARSER UTILITIES (unchanged)
-# -----------------------------------------
-def parse_main_output(text: str) -> Dict[str, Any]:
-    lines = [ln.rstrip() for ln in text.splitlines()]
-    details: List[Dict[str, Any]] = []
-    suspicious_pairs: List[List[str]] = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        m = re.match(r"^---\s*Details\s*for\s*pair:\s*(.+?)\s*(?:<->|↔)\s*(.+?)\s*---\s*$", line)
-        if m:
-            a_name, b_name = m.group(1).strip(), m.group(2).strip()
-            i += 1
-            a_to_b, b_to_a = [], []
-            while i < len(lines) and lines[i].strip() == "":
-                i += 1
-            if i < len(lines) and re.match(r"^\s*Top\s+matches\s*A", lines[i], re.I):
-                i += 1
-                while i < len(lines):
-                    if lines[i].strip() == "":
-                        i += 1
-                        continue
-                    if re.match(r"^\s*Top\s+matches\s*B", lines[i], re.I) or re.match(r"^---", lines[i]):
-                        break
-                    rec = parse_match_line(lines[i])
-                    if rec:
-                        a_to_b.append(rec)
-                    i += 1
-            if i < len(lines) and re.match(r"^\s*Top\s+matches\s*B", lines[i], re.I):
-                i += 1
-                while i < len(lines):
-                    if lines[i].strip() == "":
-                        i += 1
-                        continue
-                    if re.match(r"^---", lines[i]):
-                        break
-                    rec = parse_match_line(lines[i])
-                    if rec:
-                        b_to_a.append(rec)
-                    i += 1
-            details.append({"pair": [a_name, b_name], "topAtoB": a_to_b, "topBtoA": b_to_a})
-            continue
-        i += 1
-
-    for idx, ln in enumerate(lines):
-        if ln.strip().startswith("Suspicious Assignment Pairs"):
-            j = idx + 1
-            while j < len(lines):
-                s = lines[j].strip()
-                if not s:
-                    j += 1
-                    continue
-                if s == "(none)":
-                    break
-                m = re.match(r"^(.+?)\s*(?:↔|<->)\s*(.+)$", s)
-                if m:
-                    suspicious_pairs.append([m.group(1).strip(), m.group(2).strip()])
-                j += 1
-            break
-    return {"details": details, "suspiciousPairs": suspicious_pairs}
-
-def parse_match_line(line: str) -> Dict[str, Any] | None:
-    m = re.match(r"^\s*(\S.*\S|\S)\s*~~\s*([0-9]+(?:\.[0-9]+)?)%\s*~~\s*(\S.*\S|\S)\s*$", line)
-    if not m:
-        return None
-    return {"left": m.group(1).strip(), "right": m.group(3).strip(), "similarityPct": float(m.group(2))}
-
 # -----------------------------------------
 # ✅ ENTRY POINT
 # -----------------------------------------
@@ -0,0 +1,104 @@
+"""
+fingerprint.py
+
+Fused shingle + winnow pass.
+
+compute_file_fingerprints used to materialize the full rolling-hash sequence
+(one (hash, pos) tuple per shingle) before winnowing picked a small fraction
+of it. fingerprint_tokens drives token values -> rolling Rabin-Karp hash ->
+monotonic-deque sliding minimum in a single loop, so each shingle hash lives
+only in a (w+1)-slot ring buffer on its way to the fingerprint output and the
+intermediate sequence is never stored.
+
+The standalone rolling_hashes / winnow_arrays APIs remain for callers that
+need the individual stages.
+"""
+
+from __future__ import annotations
+from typing import List, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+from .shingle import BASE, MOD, DEFAULT_K, rolling_hash_array, token_values
+from .winnow import DEFAULT_W, dedupe_fingerprints, winnow_arrays
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _fused_kernel(tvals, k, w, pow_base, base, mod):
+        """
+        Rolling hash and winnow in one pass over token values. Shingle hashes
+        are kept in a (w+1)-slot ring buffer — the monotonic deque only ever
+        references indices within the current window.
+        """
+        n = tvals.shape[0]
+        m = n - k + 1  # number of shingles
+        span = w + 1
+        hbuf = np.empty(span, dtype=np.int64)  # hashes of the last w+1 shingles
+        dq = np.empty(m, dtype=np.int64)       # monotonic deque of shingle indices
+        head = 0
+        tail = 0
+        out_h = np.empty(m, dtype=np.int64)
+        out_p = np.empty(m, dtype=np.int64)
+        cnt = 0
+        first_pick = min(w, m) - 1
+        prev = -1
+
+        h = 0
+        for i in range(k):
+            h = (h * base + tvals[i]) % mod
+
+        for i in range(m):
+            if i > 0:
+                leading = (tvals[i - 1] * pow_base) % mod
+                h = (h - leading) % mod
+                h = (h * base + tvals[i + k - 1]) % mod
+            hbuf[i % span] = h
+            while tail > head and hbuf[dq[tail - 1] % span] >= h:
+                tail -= 1
+            dq[tail] = i
+            tail += 1
+            if dq[head] <= i - w:
+                head += 1
+            if i >= first_pick:
+                sel = dq[head]
+                if sel != prev:
+                    out_h[cnt] = hbuf[sel % span]
+                    out_p[cnt] = sel
+                    cnt += 1
+                    prev = sel
+        return out_h[:cnt], out_p[:cnt]
+else:
+    _fused_kernel = None
+
+
+def fingerprint_tokens(
+    tokens: List[str],
+    k: int = DEFAULT_K,
+    w: int = DEFAULT_W,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute winnowed fingerprints for a token sequence in one fused pass.
+    Returns deduplicated (hashes, positions) int32 arrays, identical to
+    winnow_arrays(rolling_hashes(tokens, k), w).
+    """
+    n = len(tokens)
+    if k <= 0 or w <= 0 or n < k:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty
+
+    if _fused_kernel is not None:
+        tvals = token_values(tokens)
+        pow_base = pow(BASE, k - 1, MOD)
+        out_h, out_p = _fused_kernel(tvals, k, w, pow_base, BASE, MOD)
+        return dedupe_fingerprints(out_h, out_p)
+
+    # No numba: fall back to the two-stage vectorized path.
+    hash_arr = rolling_hash_array(tokens, k=k)
+    pos_arr = np.arange(hash_arr.shape[0], dtype=np.int64)
+    return winnow_arrays(hash_arr, pos_arr, w=w)
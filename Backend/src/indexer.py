@@ -2,33 +2,83 @@
 indexer.py
 
 Builds an inverted index from fingerprints:
-    fingerprint_hash -> list of (file_id, position)
+    fingerprint_hash -> posting arrays of (file_id_int, position)
+
+File ids are interned to small ints and postings live in array.array('i')
+buffers instead of lists of (str, int) tuples, so posting lists are compact
+and iterate without per-entry tuple allocations.
 
 This allows quick lookup of which files share the same fingerprints.
 """
 
 from __future__ import annotations
+import array
 from collections import defaultdict
 from typing import Dict, List, Tuple, Set
 
+import numpy as np
+
 
 class InvertedIndex:
     def __init__(self) -> None:
-        self.map: Dict[int, List[Tuple[str, int]]] = defaultdict(list)
+        self.fid_to_int: Dict[str, int] = {}
+        self.fids: List[str] = []  # interned id -> file id string
+        self.posting_fids: Dict[int, array.array] = {}
+        self.posting_pos: Dict[int, array.array] = {}
+        # Distinct fingerprint hashes per file; lets callers bound Jaccard
+        # without re-measuring fingerprint sets.
+        self.sizes: Dict[str, int] = {}
+
+    def _intern(self, file_id: str) -> int:
+        fi = self.fid_to_int.get(file_id)
+        if fi is None:
+            fi = len(self.fids)
+            self.fid_to_int[file_id] = fi
+            self.fids.append(file_id)
+        return fi
 
-    def add(self, file_id: str, fingerprints: Set[Tuple[int, int]]) -> None:
+    def add(self, file_id: str, fingerprints: Tuple[np.ndarray, np.ndarray]) -> None:
         """
         Add fingerprints for a file into the index.
-        fingerprints: set of (hash, position)
+        fingerprints: parallel (hashes, positions) int32 arrays
         """
-        for h, pos in fingerprints:
-            self.map[h].append((file_id, pos))
+        hash_arr, pos_arr = fingerprints
+        fi = self._intern(file_id)
+        posting_fids = self.posting_fids
+        posting_pos = self.posting_pos
+        for h, pos in zip(hash_arr.tolist(), pos_arr.tolist()):
+            fids = posting_fids.get(h)
+            if fids is None:
+                fids = posting_fids[h] = array.array("i")
+                posting_pos[h] = array.array("i")
+            fids.append(fi)
+            posting_pos[h].append(pos)
+        self.sizes[file_id] = int(np.unique(hash_arr).size)
 
     def lookup(self, h: int) -> List[Tuple[str, int]]:
         """
         Return list of (file_id, position) where fingerprint h was found.
         """
-        return self.map.get(h, [])
+        fids = self.posting_fids.get(h)
+        if not fids:
+            return []
+        return [(self.fids[fi], pos) for fi, pos in zip(fids, self.posting_pos[h])]
+
+    def shared_counts(self) -> Dict[Tuple[str, str], int]:
+        """
+        Count distinct fingerprint hashes shared by each file pair that
+        co-occurs in at least one posting list. Pairs are keyed with the
+        lexicographically smaller file id first. File pairs absent from the
+        result share no fingerprints at all.
+        """
+        counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        fids = self.fids
+        for postings in self.posting_fids.values():
+            names = sorted({fids[fi] for fi in postings})
+            for i in range(len(names)):
+                for j in range(i + 1, len(names)):
+                    counts[(names[i], names[j])] += 1
+        return dict(counts)
 
     def __len__(self) -> int:
-        return len(self.map)
+        return len(self.posting_fids)
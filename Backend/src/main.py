@@ -7,7 +7,7 @@ Runs the full plagiarism detection pipeline:
 2) For each file (excluding ignored directories), preprocess -> tokens.
 3) Shingling -> rolling Rabin–Karp hashes.
 4) Winnowing -> fingerprints for each file.
-5) Build inverted index (not strictly required for Jaccard; useful for extension/bonus).
+5) Build a candidate-pair prefilter (inverted index, or MinHash/LSH on large corpora).
 6) Compare all assignment pairs:
    - File-level Jaccard similarity on fingerprint sets.
    - Assignment-level aggregation: if ≥ assignment_threshold of files in either
@@ -21,33 +21,73 @@ Bonus: With --show-details, prints top file matches with similarity scores.
 
 from __future__ import annotations
 import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from collections import defaultdict, deque
+
+import numpy as np
+
+try:
+    from datasketch import MinHash, MinHashLSH
+except ImportError:
+    MinHash = MinHashLSH = None
 
 from .preprocess import preprocess_code
-from .shingle import rolling_hashes, DEFAULT_K
-from .winnow import winnow, DEFAULT_W
+from .shingle import DEFAULT_K
+from .winnow import DEFAULT_W
+from .fingerprint import fingerprint_tokens
 from .indexer import InvertedIndex
-from .compare import is_assignment_pair_suspicious, summarize_pair_details
+from .compare import (
+    is_assignment_pair_suspicious,
+    jaccard_exact,
+    pack_fingerprints,
+    summarize_pair_details,
+)
 
 
 DEFAULT_FILE_THRESHOLD = 0.40
 DEFAULT_ASSIGNMENT_THRESHOLD = 0.40
 
-DEFAULT_IGNORES = {
+DEFAULT_IGNORES = frozenset({
     "node_modules", ".git", ".hg", ".svn", ".idea", ".vs", ".vscode",
     ".venv", "venv", "__pycache__", "dist", "build", "target", "out"
-}
+})
 
-TEXT_FILE_SUFFIXES = {
+TEXT_FILE_SUFFIXES = frozenset({
     ".c", ".h", ".cpp", ".hpp", ".cc", ".hh", ".cxx", ".hxx",
     ".java", ".js", ".jsx", ".ts", ".tsx",
     ".py", ".rb", ".go", ".rs", ".swift", ".kt", ".kts",
     ".cs", ".m", ".mm",
     ".php", ".html", ".css", ".scss", ".sql", ".sh", ".bat", ".ps1",
     ".r", ".jl", ".pl", ".lua"
-}
+})
+
+
+def _walk(root: str, ignores: Set[str]):
+    """
+    Yield text-file paths under `root` via os.scandir, pruning ignored and
+    hidden directories at the branch so their contents are never statted
+    (rglob descends into node_modules/.git/etc. and filters afterwards).
+    """
+    with os.scandir(root) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith("."):  # hidden files and directories
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if name not in ignores:
+                    yield from _walk(entry.path, ignores)
+            else:
+                # One O(1) set probe on the extension instead of trying every
+                # known suffix with endswith.
+                suffix = os.path.splitext(name)[1]
+                if suffix and suffix.lower() in TEXT_FILE_SUFFIXES:
+                    yield entry.path
 
 
 def collect_assignments(corpus_dir: Path, ignores: Set[str]) -> Dict[str, List[Path]]:
@@ -60,54 +100,144 @@ def collect_assignments(corpus_dir: Path, ignores: Set[str]) -> Dict[str, List[P
         raise FileNotFoundError(f"Corpus directory not found: {corpus_dir}")
 
     for sub in sorted(p for p in corpus_dir.iterdir() if p.is_dir()):
-        files: List[Path] = []
-        for path in sub.rglob("*"):
-            if path.is_dir():
-                # Skip ignored directory names
-                if path.name in ignores:
-                    # Skip walking deeper by not adding; rglob will still descend, but we filter files
-                    continue
-                continue
-            if path.name.startswith("."):  # hidden files
-                continue
-            if any(part in ignores for part in path.parts):
-                continue
-            if path.suffix.lower() in TEXT_FILE_SUFFIXES:
-                files.append(path)
-        assignments[sub.name] = sorted(files)
+        assignments[sub.name] = sorted(Path(p) for p in _walk(str(sub), ignores))
     return assignments
 
 
+# Below this many files the pool startup cost outweighs the parallel win.
+MIN_FILES_FOR_POOL = 16
+
+# Read-ahead for the serial fingerprint path: IO threads fetch upcoming file
+# bytes while the CPU tokenizes the current one. The window is bounded so a
+# large corpus never sits fully buffered in memory.
+_READ_THREADS = 8
+_READ_PREFETCH = 32
+
+
+def _read_all(paths: List[Path]):
+    """
+    Yield (path, bytes) in order with up to _READ_PREFETCH files in flight
+    on a thread pool. read_bytes releases the GIL in the kernel, so reads
+    overlap the pure-Python tokenize/hash work of the consumer.
+    """
+    with ThreadPoolExecutor(max_workers=_READ_THREADS) as ex:
+        pending: deque = deque()
+        for p in paths:
+            pending.append((p, ex.submit(p.read_bytes)))
+            if len(pending) >= _READ_PREFETCH:
+                fpath, fut = pending.popleft()
+                yield fpath, fut.result()
+        while pending:
+            fpath, fut = pending.popleft()
+            yield fpath, fut.result()
+
+# Above this many files, exact shared_counts() prefiltering gets quadratic in
+# posting-list sizes; switch to MinHash/LSH bucketing for candidate pairs.
+MIN_FILES_FOR_LSH = 256
+LSH_NUM_PERM = 128
+
+# Per-file fingerprints: parallel (hashes, positions) int32 arrays (SoA) —
+# two packed ints per fingerprint instead of a boxed tuple in a hash set.
+Fingerprints = Tuple[np.ndarray, np.ndarray]
+
+
+def _fingerprint_one(
+    fpath: Path,
+    k: int,
+    w: int,
+    cache_dir: Path | None = None
+) -> Tuple[str, Fingerprints]:
+    """
+    Fingerprint a single file: read -> preprocess -> rolling hashes -> winnow.
+    Module-level so it is picklable for process-pool workers.
+    """
+    return _fingerprint_bytes(fpath, fpath.read_bytes(), k, w, cache_dir)
+
+
+def _fingerprint_bytes(
+    fpath: Path,
+    data: bytes,
+    k: int,
+    w: int,
+    cache_dir: Path | None = None
+) -> Tuple[str, Fingerprints]:
+    """
+    Fingerprint already-read file bytes. The bytes are decoded as latin-1:
+    a 1:1 byte->codepoint mapping that never fails, skips UTF-8 validation,
+    and is lossless for the ASCII source the tokenizer cares about.
+    """
+    # Fingerprints are a pure function of (file bytes, k, w), so warm runs can
+    # load them from the on-disk cache keyed by content digest.
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        cache_path = cache_dir / f"{digest}_{k}_{w}.npz"
+        try:
+            with np.load(cache_path) as npz:
+                return str(fpath), (npz["hashes"], npz["positions"])
+        except (OSError, KeyError, ValueError):
+            pass  # miss or unreadable entry; recompute below
+
+    tokens = preprocess_code(data.decode("latin-1"), fpath)
+    fps = fingerprint_tokens(tokens, k=k, w=w)
+
+    if cache_path is not None:
+        # Write via a unique temp file + atomic rename so concurrent pool
+        # workers never observe a half-written entry.
+        tmp = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as fh:
+                np.savez(fh, hashes=fps[0], positions=fps[1])
+            os.replace(tmp, cache_path)
+        except OSError:
+            tmp.unlink(missing_ok=True)  # cache is best-effort
+    return str(fpath), fps
+
+
 def compute_file_fingerprints(
     files: List[Path],
     k: int,
-    w: int
-) -> Dict[str, Set[Tuple[int, int]]]:
+    w: int,
+    jobs: int | None = None,
+    cache_dir: Path | None = None
+) -> Dict[str, Fingerprints]:
     """
     For each file path, compute fingerprints via shingling + rolling hash + winnowing.
-    Returns mapping file_id (str) -> set of (hash, position)
+    Files are fingerprinted in parallel across a process pool (fingerprinting is
+    CPU-bound and independent per file); small corpora stay serial to skip pool
+    startup overhead. `jobs` caps the worker count (defaults to os.cpu_count();
+    1 forces the serial path). With `cache_dir`, per-file results are persisted
+    on disk keyed by content digest so unchanged files are loaded, not recomputed.
+    Returns mapping file_id (str) -> (hashes, positions) int32 arrays
     """
-    file_fps: Dict[str, Set[Tuple[int, int]]] = {}
-    for fpath in files:
-        try:
-            text = fpath.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            # Fallback to binary read and decode as latin-1; last resort
-            text = fpath.read_bytes().decode("latin-1", errors="ignore")
-
-        tokens = preprocess_code(text, fpath)
-        rh = rolling_hashes(tokens, k=k)
-        fps = winnow(rh, w=w)
-        file_fps[str(fpath)] = set((h, pos) for (h, pos) in fps)
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    file_fps: Dict[str, Fingerprints] = {}
+    workers = jobs if jobs is not None else (os.cpu_count() or 1)
+    if workers <= 1 or len(files) < MIN_FILES_FOR_POOL:
+        # Serial CPU work, but reads are prefetched on IO threads.
+        for fpath, data in _read_all(files):
+            fid, fps = _fingerprint_bytes(fpath, data, k, w, cache_dir)
+            file_fps[fid] = fps
+        return file_fps
+
+    # Chunk so each worker sees ~4 batches: big enough to amortize pickling,
+    # small enough to keep the pool load-balanced on skewed file sizes.
+    chunksize = max(1, len(files) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        fn = partial(_fingerprint_one, k=k, w=w, cache_dir=cache_dir)
+        for fid, fps in ex.map(fn, files, chunksize=chunksize):
+            file_fps[fid] = fps
     return file_fps
 
 
-def set_of_hashes(fps: Set[Tuple[int, int]]) -> Set[int]:
-    """Drop positions; keep only hash values for Jaccard."""
-    return {h for (h, _) in fps}
+def set_of_hashes(fps: Fingerprints) -> np.ndarray:
+    """Drop positions; keep unique hash values for Jaccard."""
+    return np.unique(fps[0])
 
 
-def build_index(file_fps: Dict[str, Set[Tuple[int, int]]]) -> InvertedIndex:
+def build_index(file_fps: Dict[str, Fingerprints]) -> InvertedIndex:
     """
     Build an inverted index of fingerprints. Could be used for bonus highlighting.
     """
@@ -117,12 +247,84 @@ def build_index(file_fps: Dict[str, Set[Tuple[int, int]]]) -> InvertedIndex:
     return idx
 
 
+def _candidate_assignment_pairs(
+    index: InvertedIndex,
+    assignments: Dict[str, List[Path]],
+    sizes: Dict[str, int],
+    file_threshold: float,
+) -> Set[Tuple[str, str]]:
+    """
+    Use the inverted index as a blocking prefilter: an assignment pair is a
+    candidate only if some cross-assignment file pair shares enough distinct
+    fingerprints that shared / (|A| + |B| - shared) clears file_threshold.
+    File pairs sharing no fingerprint never appear in shared_counts, so benign
+    corpora generate almost no candidates. `sizes` holds each file's distinct
+    fingerprint count, precomputed once when the bitsets are packed.
+    """
+    owner = {str(p): name for name, files in assignments.items() for p in files}
+    candidates: Set[Tuple[str, str]] = set()
+    for (fa, fb), shared in index.shared_counts().items():
+        owner_a, owner_b = owner.get(fa), owner.get(fb)
+        if owner_a is None or owner_b is None or owner_a == owner_b:
+            continue
+        sa, sb = sizes[fa], sizes[fb]
+        lo, hi = (sa, sb) if sa <= sb else (sb, sa)
+        # Jaccard <= min/max even for full containment; cheap size-ratio bound
+        # avoids the union arithmetic for hopeless pairs.
+        if hi == 0 or lo < file_threshold * hi:
+            continue
+        union = sa + sb - shared
+        if union and shared / union >= file_threshold:
+            candidates.add((owner_a, owner_b) if owner_a <= owner_b else (owner_b, owner_a))
+    return candidates
+
+
+def _candidate_assignment_pairs_lsh(
+    file_fps: Dict[str, Fingerprints],
+    assignments: Dict[str, List[Path]],
+    sizes: Dict[str, int],
+    file_threshold: float,
+) -> Set[Tuple[str, str]]:
+    """
+    Sublinear candidate generation for large corpora: bucket each file's MinHash
+    by LSH bands and only pair files that collide in some bucket, grouped by
+    assignment. Recall is probabilistic but tuned to file_threshold.
+    """
+    owner = {str(p): name for name, files in assignments.items() for p in files}
+    lsh = MinHashLSH(threshold=file_threshold, num_perm=LSH_NUM_PERM)
+    minhashes: Dict[str, MinHash] = {}
+    for fid, (hash_arr, _) in file_fps.items():
+        m = MinHash(num_perm=LSH_NUM_PERM)
+        m.update_batch([int(h).to_bytes(8, "little") for h in np.unique(hash_arr)])
+        minhashes[fid] = m
+        lsh.insert(fid, m)
+
+    candidates: Set[Tuple[str, str]] = set()
+    for fid, m in minhashes.items():
+        owner_a = owner.get(fid)
+        if owner_a is None:
+            continue
+        for other in lsh.query(m):
+            owner_b = owner.get(other)
+            if owner_b is None or owner_b == owner_a:
+                continue
+            # Jaccard <= min/max: drop bucket collisions between files whose
+            # fingerprint counts alone rule out clearing file_threshold.
+            sa, sb = sizes[fid], sizes[other]
+            lo, hi = (sa, sb) if sa <= sb else (sb, sa)
+            if hi == 0 or lo < file_threshold * hi:
+                continue
+            candidates.add((owner_a, owner_b) if owner_a <= owner_b else (owner_b, owner_a))
+    return candidates
+
+
 def compare_assignments(
     assignments: Dict[str, List[Path]],
-    file_fps: Dict[str, Set[Tuple[int, int]]],
+    file_fps: Dict[str, Fingerprints],
     file_threshold: float,
     assignment_threshold: float,
-    show_details: bool = False
+    show_details: bool = False,
+    index: InvertedIndex | None = None
 ) -> Dict[str, List[Dict]]:
     """
     Compare each pair of assignments and report suspicious pairs and file-level details.
@@ -139,26 +341,54 @@ def compare_assignments(
         ]
       }
     """
-    file_hash_sets: Dict[str, Set[int]] = {
-        fid: set_of_hashes(fps) for fid, fps in file_fps.items()
-    }
+    # One unique pass per file yields the packed bitset, |A| for the
+    # size-based candidate bounds, and the sorted unique hash array that
+    # exact rescoring of reported matches runs on.
+    file_bitsets: Dict[str, np.ndarray] = {}
+    file_sizes: Dict[str, int] = {}
+    file_hashes: Dict[str, np.ndarray] = {}
+    for fid, fps in file_fps.items():
+        uniq = set_of_hashes(fps)
+        file_bitsets[fid] = pack_fingerprints(uniq)
+        file_sizes[fid] = int(uniq.size)
+        file_hashes[fid] = uniq
+
+    # Candidate prefilter: LSH bucketing on large corpora, otherwise the exact
+    # inverted index. The index is only built when that path will actually use
+    # it — constructing one for the LSH path would be dead work.
+    if MinHashLSH is not None and len(file_fps) >= MIN_FILES_FOR_LSH:
+        candidate_pairs = _candidate_assignment_pairs_lsh(file_fps, assignments, file_sizes, file_threshold)
+    else:
+        if index is None:
+            index = build_index(file_fps)
+        candidate_pairs = _candidate_assignment_pairs(index, assignments, file_sizes, file_threshold)
 
     suspicious_pairs = []
     details = []
     names = sorted(assignments.keys())
 
+    # Per-assignment file-id lists, built once — the pair loop below visits
+    # each assignment O(n) times and must not redo the str()/filter work.
+    assignment_files: Dict[str, List[str]] = {
+        name: [str(p) for p in paths if str(p) in file_bitsets]
+        for name, paths in assignments.items()
+    }
+
     for i in range(len(names)):
         for j in range(i + 1, len(names)):
             a, b = names[i], names[j]
-            files_a = [str(p) for p in assignments[a] if str(p) in file_hash_sets]
-            files_b = [str(p) for p in assignments[b] if str(p) in file_hash_sets]
+            if candidate_pairs is not None and (a, b) not in candidate_pairs:
+                # No cross-assignment file pair can clear file_threshold;
+                # skip the Jaccard computations entirely.
+                details.append({"pair": (a, b), "topAtoB": [], "topBtoA": []})
+                continue
+            files_a = assignment_files[a]
+            files_b = assignment_files[b]
             if not files_a or not files_b:
                 continue
 
-            hash_only_fps = {fid: file_hash_sets[fid] for fid in (files_a + files_b)}
-
             flag, best_a_to_b, best_b_to_a = is_assignment_pair_suspicious(
-                files_a, files_b, hash_only_fps, file_threshold, assignment_threshold
+                files_a, files_b, file_bitsets, file_threshold, assignment_threshold
             )
 
             if flag:
@@ -167,15 +397,20 @@ def compare_assignments(
             top_a = summarize_pair_details(best_a_to_b, top_k=5)
             top_b = summarize_pair_details(best_b_to_a, top_k=5)
 
+            # The bitset matrix folds hashes to 16 bits, which can inflate a
+            # score via collisions; the few matches actually reported get an
+            # exact Jaccard over the full hash arrays.
             details.append({
                 "pair": (a, b),
                 "topAtoB": [
-                    {"left": fa, "right": fb, "similarityPct": s * 100}
-                    for fa, fb, s in top_a
+                    {"left": fa, "right": fb,
+                     "similarityPct": jaccard_exact(file_hashes[fa], file_hashes[fb]) * 100}
+                    for fa, fb, _s in top_a
                 ],
                 "topBtoA": [
-                    {"left": fb, "right": fa, "similarityPct": s * 100}
-                    for fb, fa, s in top_b
+                    {"left": fb, "right": fa,
+                     "similarityPct": jaccard_exact(file_hashes[fb], file_hashes[fa]) * 100}
+                    for fb, fa, _s in top_b
                 ],
             })
 
@@ -192,6 +427,9 @@ def main():
     parser.add_argument("--assignment-threshold", type=float, default=DEFAULT_ASSIGNMENT_THRESHOLD, help="Assignment-level fraction threshold")
     parser.add_argument("--ignore", type=str, default="", help="Comma-separated list of additional folders to ignore")
     parser.add_argument("--show-details", action="store_true", help="Show top file match details")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON instead of human-readable text")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for fingerprinting (default: cpu count; 1 disables the pool)")
+    parser.add_argument("--cache-dir", type=str, default="~/.cache/plagcheck", help="Directory for the persistent fingerprint cache (empty string disables caching)")
 
     args = parser.parse_args()
 
@@ -204,20 +442,26 @@ def main():
 
     # Flatten all files for footprinting
     all_files = [p for files in assignments.values() for p in files]
-    file_fps = compute_file_fingerprints(all_files, k=args.k, w=args.w)
-
-    # Optional: build index (currently not required for core flow; kept for extension/bonus)
-    _ = build_index(file_fps)
+    cache_dir = Path(args.cache_dir).expanduser() if args.cache_dir else None
+    file_fps = compute_file_fingerprints(
+        all_files, k=args.k, w=args.w, jobs=args.jobs, cache_dir=cache_dir
+    )
 
-    # Compare
+    # Compare. The candidate prefilter (inverted index or LSH) is built
+    # inside compare_assignments, which knows which one it needs.
     results = compare_assignments(
         assignments,
         file_fps,
         file_threshold=args.file_threshold,
         assignment_threshold=args.assignment_threshold,
-        show_details=args.show_details 
+        show_details=args.show_details,
     )
 
+    if args.json:
+        # Structured output for machine consumers; no regex parsing required.
+        print(json.dumps(results))
+        return
+
     print("\nSuspicious Assignment Pairs:")
     if not results["suspiciousPairs"]:
         print("(none)")
@@ -8,7 +8,7 @@ Preprocessing utilities:
 - Normalize identifiers and literals to reduce false negatives across renamings.
 
 Design:
-- Comment stripping uses regular expressions for line and block comments.
+- Comment stripping is a single-pass state machine over the text (string-literal aware).
 - Tokenization extracts operators, punctuation, identifiers, numbers, and strings.
 - Keywords for several languages are preserved; other identifiers -> 'ID'.
 """
@@ -18,8 +18,9 @@ import re
 from pathlib import Path
 from typing import List
 
-# Common language keywords (union of major sets)
-KEYWORDS = set("""
+# Common language keywords (union of major sets). A frozenset so membership
+# tests hash against an immutable table built once at import.
+KEYWORDS = frozenset("""
 auto break case char const continue default do double else enum extern float for goto if inline int long register
 restrict return short signed sizeof static struct switch typedef union unsigned void volatile while
 class typename template this new delete public private protected friend virtual operator namespace using try catch throw
@@ -34,50 +35,110 @@ ID_TOKEN = "ID"
 NUM_TOKEN = "NUM"
 STR_TOKEN = "STR"
 
-# Regex patterns for comment removal
-LINE_COMMENT_CPP_JS = re.compile(r"//.*?$", re.MULTILINE)
-BLOCK_COMMENT_CPP_JS = re.compile(r"/\*.*?\*/", re.DOTALL)
-LINE_COMMENT_PY = re.compile(r"#[^\n]*", re.MULTILINE)
-# Python triple-quoted strings (often used as docstrings). We treat them like comments for normalization.
-PY_TRIPLE_STR = re.compile(r"(?:'''(?:.|\n)*?'''|\"\"\"(?:.|\n)*?\"\"\")", re.MULTILINE)
-
-# String and number literals
-STRING_LITERAL = re.compile(
-    r"""(\"([^\"\\]|\\.)*\"|\'([^\'\\]|\\.)*\')""",
-    re.MULTILINE,
+# Single-pass token scanner: one named alternation visits each character once,
+# replacing the previous literal-substitution pass plus operator split plus
+# per-piece identifier findall. Order matters — strings before numbers before
+# identifiers, with operators (longest first) and a \S catch-all at the end.
+TOKEN_SCANNER = re.compile(
+    r"(?P<STR>\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')"
+    r"|(?P<NUM>\b(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\b)"
+    r"|(?P<ID>[_A-Za-z]\w*)"
+    r"|(?P<OP>\+\+|--|==|!=|<=|>=|<<=|>>=|->|&&|\|\||<<|>>|::|\+=|-=|\*=|/=|%=|&=|\^=|\|=|=|\S)"
 )
-NUMBER_LITERAL = re.compile(r"\b(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\b")
 
-# Identifiers (broad)
-IDENTIFIER = re.compile(r"\b[_A-Za-z]\w*\b")
 
-# Operators and punctuation (kept as tokens)
-OPERATORS_PUNCT = re.compile(r"(\+\+|--|==|!=|<=|>=|<<=|>>=|->|&&|\|\||<<|>>|::|\+=|-=|\*=|/=|%=|&=|\^=|\|=|=|[+\-*/%&|\^~!<>?:;,.()\[\]{}])")
-
-WHITESPACE = re.compile(r"\s+")
+# strip_comments states
+_S_NORMAL = 0
+_S_LINE = 1       # // or # to end of line
+_S_BLOCK = 2      # /* ... */
+_S_SQ = 3         # '...' string
+_S_DQ = 4         # "..." string
+_S_TRIPLE = 5     # '''...''' / \"\"\"...\"\"\" (Python only)
 
 
 def strip_comments(text: str, suffix: str) -> str:
     """
-    Remove comments for C/C++/Java/JS and Python-like files.
+    Remove comments for C/C++/Java/JS and Python-like files: // and /* */
+    everywhere, # lines everywhere (common in shell/py), and triple-quoted
+    strings for .py (treated as docstrings/comments).
+
+    One linear scan with a small state machine instead of stacked re.sub
+    passes — each character is visited once, and comment markers inside
+    string literals are left alone (the regex passes stripped a // inside
+    a \"...\" string).
     """
-    # Remove block comments /* ... */ and // line comments (C-like)
-    text = re.sub(BLOCK_COMMENT_CPP_JS, "", text)
-    text = re.sub(LINE_COMMENT_CPP_JS, "", text)
-
-    # Python-specific: remove triple-quoted strings (treated as comments/docstrings) and # line comments
-    if suffix in {".py"}:
-        text = re.sub(PY_TRIPLE_STR, "", text)
-        text = re.sub(LINE_COMMENT_PY, "", text)
-    else:
-        # Even for non-py, remove # lines commonly used in shell/py
-        text = re.sub(LINE_COMMENT_PY, "", text)
-    return text
+    is_py = suffix == ".py"
+    out: List[str] = []
+    append = out.append
+    state = _S_NORMAL
+    triple_quote = ""
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if state == _S_NORMAL:
+            if ch == "/" and i + 1 < n:
+                nxt = text[i + 1]
+                if nxt == "/":
+                    state = _S_LINE
+                    i += 2
+                    continue
+                if nxt == "*":
+                    state = _S_BLOCK
+                    i += 2
+                    continue
+            elif ch == "#":
+                state = _S_LINE
+                i += 1
+                continue
+            elif ch == "'" or ch == '"':
+                if is_py and text[i:i + 3] == ch * 3:
+                    state = _S_TRIPLE
+                    triple_quote = ch * 3
+                    i += 3
+                    continue
+                state = _S_SQ if ch == "'" else _S_DQ
+            append(ch)
+            i += 1
+        elif state == _S_LINE:
+            if ch == "\n":
+                append(ch)  # keep the line break, like the old line regexes
+                state = _S_NORMAL
+            i += 1
+        elif state == _S_BLOCK:
+            if ch == "*" and text[i:i + 2] == "*/":
+                state = _S_NORMAL
+                i += 2
+            else:
+                i += 1
+        elif state == _S_TRIPLE:
+            if ch == triple_quote[0] and text[i:i + 3] == triple_quote:
+                state = _S_NORMAL
+                i += 3
+            else:
+                i += 1
+        else:  # _S_SQ / _S_DQ
+            if ch == "\\" and i + 1 < n:
+                append(ch)
+                append(text[i + 1])
+                i += 2
+                continue
+            if ch == ("'" if state == _S_SQ else '"') or ch == "\n":
+                # closing quote, or unterminated at end of line — don't let a
+                # stray apostrophe swallow the rest of the file
+                state = _S_NORMAL
+            append(ch)
+            i += 1
+    return "".join(out)
 
 
 def normalize_whitespace(text: str) -> str:
-    """Collapse whitespace to single spaces and strip."""
-    return re.sub(WHITESPACE, " ", text).strip()
+    """
+    Collapse whitespace to single spaces and strip. str.split is a dedicated
+    C loop — no regex machinery — and splitting on None drops leading and
+    trailing whitespace for free.
+    """
+    return " ".join(text.split())
 
 
 def tokenize(text: str) -> List[str]:
@@ -88,47 +149,20 @@ def tokenize(text: str) -> List[str]:
     - Preserve known keywords; map other identifiers to ID.
     """
     tokens: List[str] = []
-    i = 0
-    n = len(text)
-
-    # Pre-replace literals to placeholders to avoid double-tokenization
-    def mark_literals(s: str) -> str:
-        s = re.sub(STRING_LITERAL, STR_TOKEN, s)
-        s = re.sub(NUMBER_LITERAL, NUM_TOKEN, s)
-        return s
-
-    text = mark_literals(text)
-
-    # Split by operators/punctuation and words
-    parts = re.split(OPERATORS_PUNCT, text)
-    # re.split keeps delimiters; re.findall helps to re-collect them
-    delims = re.findall(OPERATORS_PUNCT, text)
-
-    # Merge sequence: part0, delim0, part1, delim1, ...
-    merged: List[str] = []
-    for idx, part in enumerate(parts):
-        if part:
-            merged.append(part)
-        if idx < len(delims):
-            merged.append(delims[idx])
-
-    for piece in merged:
-        piece = piece.strip()
-        if not piece:
-            continue
-        if piece in {STR_TOKEN, NUM_TOKEN}:
-            tokens.append(piece)
-            continue
-        # Identify identifiers / keywords
-        for tok in re.findall(r"[_A-Za-z]\w*|\S", piece):
-            if tok.isidentifier():
-                low = tok.lower()
-                if low in KEYWORDS:
-                    tokens.append(low)
-                else:
-                    tokens.append(ID_TOKEN)
-            else:
-                tokens.append(tok)
+    append = tokens.append
+    for m in TOKEN_SCANNER.finditer(text):
+        group = m.lastgroup
+        if group == "ID":
+            # The targeted languages (C/C++/Java/JS/Python) are case-sensitive,
+            # so keywords are matched as written — no per-token .lower() copy.
+            tok = m.group()
+            append(tok if tok in KEYWORDS else ID_TOKEN)
+        elif group == "OP":
+            append(m.group())
+        elif group == "NUM":
+            append(NUM_TOKEN)
+        else:
+            append(STR_TOKEN)
     return tokens
 
 
@@ -136,14 +170,15 @@ def preprocess_code(text: str, file_path: Path) -> List[str]:
     """
     Full preprocessing for a file:
     - Strip comments
-    - Normalize whitespace
     - Tokenize
     Returns a list of tokens.
+
+    The scanner skips whitespace on its own, so no separate normalization
+    pass over the text is needed.
     """
     suffix = file_path.suffix.lower()
     no_comments = strip_comments(text, suffix)
-    normalized = normalize_whitespace(no_comments)
-    tokens = tokenize(normalized)
+    tokens = tokenize(no_comments)
     return tokens
 
 
@@ -14,9 +14,17 @@ This yields a sequence of hashes, one per k-token shingle.
 from __future__ import annotations
 from typing import Iterable, List, Tuple
 
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 DEFAULT_K = 5
 BASE = 257            # base for polynomial hash
 MOD = 2_147_483_647   # large prime (2^31 - 1)
+TOKEN_BASE = 131      # base for the per-token character hash
 
 def token_to_int(tok: str) -> int:
     """
@@ -26,38 +34,126 @@ def token_to_int(tok: str) -> int:
     # Python built-in hash is salted per run; avoid it. Use deterministic.
     val = 0
     for ch in tok:
-        val = (val * 131 + ord(ch)) % MOD
+        val = (val * TOKEN_BASE + ord(ch)) % MOD
     return val
 
 
-def rolling_hashes(tokens: List[str], k: int = DEFAULT_K) -> List[Tuple[int, int]]:
+# Per-process memo of token -> hash. The preprocessor collapses identifiers
+# and literals to a tiny vocabulary (placeholders, keywords, operators), so
+# this stays bounded and the hit rate across files approaches 100%. A plain
+# dict rather than lru_cache: no lock, and each pool worker keeps its own.
+_TOKEN_HASH_CACHE: dict = {}
+
+
+def token_values(tokens: List[str]) -> np.ndarray:
     """
-    Compute rolling Rabin–Karp hashes for k-length shingles.
+    token_to_int over a whole token list. Distinct tokens are hashed once via
+    the vectorized batch path and memoized in _TOKEN_HASH_CACHE; repeat
+    occurrences — the vast majority after normalization — are dict lookups.
+    """
+    n = len(tokens)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    cache = _TOKEN_HASH_CACHE
+    misses = [t for t in tokens if t not in cache]
+    if misses:
+        distinct = list(dict.fromkeys(misses))
+        cache.update(zip(distinct, _hash_token_batch(distinct).tolist()))
+    return np.fromiter((cache[t] for t in tokens), dtype=np.int64, count=n)
 
-    Returns: list of (hash_value, start_index)
+
+def _hash_token_batch(tokens: List[str]) -> np.ndarray:
+    """
+    Vectorized token_to_int over a batch: one NumPy pass over the
+    concatenated byte buffer instead of a Python character loop per token.
+    Each token's Horner hash equals sum(ch_i * TOKEN_BASE^(L-1-i)) mod MOD,
+    computed here with a power table and np.add.reduceat on token boundaries.
+    """
+    n = len(tokens)
+    try:
+        joined = "".join(tokens).encode("latin-1")
+    except UnicodeEncodeError:
+        # Tokens outside latin-1 (never produced by the preprocessor's own
+        # latin-1 decode path); hash them one by one.
+        return np.fromiter((token_to_int(t) for t in tokens), dtype=np.int64, count=n)
+
+    data = np.frombuffer(joined, dtype=np.uint8).astype(np.int64)
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=n)
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+
+    max_len = int(lengths.max())
+    pows = np.empty(max_len, dtype=np.int64)
+    p = 1
+    for i in range(max_len):
+        pows[i] = p
+        p = (p * TOKEN_BASE) % MOD
+
+    # Exponent of each character: distance from its token's last character.
+    exps = np.repeat(starts + lengths - 1, lengths) - np.arange(data.shape[0])
+    contrib = (data * pows[exps]) % MOD
+    return np.add.reduceat(contrib, starts) % MOD
+
+
+if njit is not None:
+    @njit(cache=True, boundscheck=False)
+    def _rolling_hashes_kernel(tvals, k, pow_base, base, mod):
+        """Scalar Rabin–Karp recurrence lowered to native int64 code."""
+        n = tvals.shape[0]
+        m = n - k + 1
+        out = np.empty(m, dtype=np.int64)
+        h = 0
+        for i in range(k):
+            h = (h * base + tvals[i]) % mod
+        out[0] = h
+        for i in range(1, m):
+            # Remove oldest: tvals[i-1] * BASE^(k-1)
+            leading = (tvals[i - 1] * pow_base) % mod
+            h = (h - leading) % mod
+            # Multiply by base and add new
+            h = (h * base + tvals[i + k - 1]) % mod
+            out[i] = h
+        return out
+else:
+    _rolling_hashes_kernel = None
+
+
+def rolling_hash_array(tokens: List[str], k: int = DEFAULT_K) -> np.ndarray:
+    """
+    Compute rolling Rabin–Karp hashes for k-length shingles as a contiguous
+    int64 array; index i holds the hash of tokens[i:i+k].
     """
     n = len(tokens)
     if k <= 0 or n < k:
-        return []
+        return np.empty(0, dtype=np.int64)
+
+    tvals = token_values(tokens)
 
-    tvals = [token_to_int(t) for t in tokens]
+    # BASE^(k-1) % MOD in one C call (modular exponentiation)
+    pow_base = pow(BASE, k - 1, MOD)
 
-    # Precompute BASE^(k-1) % MOD
-    pow_base = 1
-    for _ in range(k - 1):
-        pow_base = (pow_base * BASE) % MOD
+    if _rolling_hashes_kernel is not None:
+        return _rolling_hashes_kernel(tvals, k, pow_base, BASE, MOD)
 
-    # Initial hash
+    # Pure-Python fallback over plain ints
+    tl = tvals.tolist()
     h = 0
     for i in range(k):
-        h = (h * BASE + tvals[i]) % MOD
-    hashes = [(h, 0)]
-
+        h = (h * BASE + tl[i]) % MOD
+    out = [h]
     for i in range(1, n - k + 1):
-        # Remove oldest: tvals[i-1] * BASE^(k-1)
-        leading = (tvals[i - 1] * pow_base) % MOD
+        leading = (tl[i - 1] * pow_base) % MOD
         h = (h - leading) % MOD
-        # Multiply by base and add new
-        h = (h * BASE + tvals[i + k - 1]) % MOD
-        hashes.append((h, i))
-    return hashes
+        h = (h * BASE + tl[i + k - 1]) % MOD
+        out.append(h)
+    return np.array(out, dtype=np.int64)
+
+
+def rolling_hashes(tokens: List[str], k: int = DEFAULT_K) -> List[Tuple[int, int]]:
+    """
+    Compute rolling Rabin–Karp hashes for k-length shingles.
+
+    Returns: list of (hash_value, start_index)
+    Compatibility wrapper over rolling_hash_array for tuple-based callers.
+    """
+    return [(h, i) for i, h in enumerate(rolling_hash_array(tokens, k).tolist())]
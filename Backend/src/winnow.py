@@ -9,50 +9,128 @@ Given a list of (hash, position) for shingles and a window size w:
 - Return a set of fingerprints as (hash, position_of_selected_min).
 
 This reduces sensitivity to small edits and yields stable fingerprints.
+
+The sliding minimum runs as a Numba-compiled kernel over int64 arrays when
+numba is installed (a ring buffer stands in for the deque, which is not
+nopython-friendly); otherwise a vectorized NumPy sliding_window_view
+minimum is used.
 """
 
 from __future__ import annotations
 from typing import Iterable, List, Set, Tuple
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 DEFAULT_W = 4
 
+
+if njit is not None:
+    @njit(cache=True)
+    def _winnow_kernel(hash_arr, pos_arr, w):
+        """
+        Monotonic-deque sliding minimum over int64 arrays.
+        Returns (selected_hashes, selected_positions); may contain duplicates,
+        the caller deduplicates into a set.
+        """
+        n = hash_arr.shape[0]
+        dq = np.empty(n, dtype=np.int64)  # ring buffer of indices
+        head = 0
+        tail = 0
+        out_h = np.empty(n, dtype=np.int64)
+        out_p = np.empty(n, dtype=np.int64)
+        m = 0
+        first_pick = min(w, n) - 1
+        prev = -1
+        for i in range(n):
+            h = hash_arr[i]
+            while tail > head and hash_arr[dq[tail - 1]] >= h:
+                tail -= 1
+            dq[tail] = i
+            tail += 1
+            if dq[head] <= i - w:
+                head += 1
+            if i >= first_pick:
+                sel = dq[head]
+                if sel != prev:
+                    out_h[m] = hash_arr[sel]
+                    out_p[m] = pos_arr[sel]
+                    m += 1
+                    prev = sel
+        return out_h[:m], out_p[:m]
+else:
+    _winnow_kernel = None
+
+
+def _winnow_numpy(hash_arr: np.ndarray, pos_arr: np.ndarray, w: int):
+    """
+    Vectorized sliding-minimum fallback when numba is absent: view the hash
+    array as overlapping windows and take each window's rightmost minimum via
+    argmin over the reversed window. The selected fingerprint set is exactly
+    the set of window winners, so unique winner indices reproduce the deque
+    algorithm's output.
+    """
+    n = hash_arr.shape[0]
+    we = min(w, n)
+    windows = sliding_window_view(hash_arr, we)
+    arg = (we - 1) - windows[:, ::-1].argmin(axis=1)
+    sel = np.unique(arg + np.arange(windows.shape[0]))
+    return hash_arr[sel].astype(np.int64), pos_arr[sel].astype(np.int64)
+
+
+def dedupe_fingerprints(out_h: np.ndarray, out_p: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A fingerprint can be re-selected after the window minimum moves away and
+    back; deduplicate via a combined 64-bit (hash << 32 | pos) key and return
+    int32 arrays sorted by (hash, position).
+    """
+    key = np.unique((out_h << np.int64(32)) | out_p)
+    return (key >> np.int64(32)).astype(np.int32), (key & np.int64(0xFFFFFFFF)).astype(np.int32)
+
+
+def winnow_arrays(
+    hash_arr: np.ndarray,
+    pos_arr: np.ndarray,
+    w: int = DEFAULT_W,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Winnow fingerprints held as parallel hash/position arrays (SoA layout —
+    two int32s per fingerprint instead of a boxed tuple in a set).
+    Returns deduplicated (hashes, positions) int32 arrays sorted by
+    (hash, position).
+    """
+    if w <= 0 or hash_arr.size == 0:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty
+
+    if _winnow_kernel is not None:
+        out_h, out_p = _winnow_kernel(
+            hash_arr.astype(np.int64, copy=False),
+            pos_arr.astype(np.int64, copy=False),
+            w,
+        )
+    else:
+        out_h, out_p = _winnow_numpy(hash_arr, pos_arr, w)
+
+    return dedupe_fingerprints(out_h, out_p)
+
+
 def winnow(hashes: List[Tuple[int, int]], w: int = DEFAULT_W) -> Set[Tuple[int, int]]:
     """
     Apply winnowing to a list of (hash, pos). Returns a set of selected (hash, pos).
+
+    Compatibility wrapper over winnow_arrays for tuple-based callers.
     """
     if w <= 0 or not hashes:
         return set()
 
-    selected: Set[Tuple[int, int]] = set()
     n = len(hashes)
-    window = []  # holds indices into 'hashes'
-
-    # Initialize first window
-    for i in range(min(w, n)):
-        window.append(i)
-
-    def pick_min(window_indices: List[int]) -> Tuple[int, int]:
-        # Returns (hash, pos) of the rightmost minimum in current window
-        min_hash = None
-        min_idx = None
-        for idx in window_indices:
-            h, pos = hashes[idx]
-            if (min_hash is None) or (h < min_hash) or (h == min_hash and idx > (min_idx or -1)):
-                min_hash = h
-                min_idx = idx
-        return hashes[min_idx]
-
-    # Pick for first window
-    min_pair = pick_min(window)
-    selected.add(min_pair)
-
-    # Slide window
-    for right in range(w, n):
-        window.pop(0)
-        window.append(right)
-        new_min_pair = pick_min(window)
-        if new_min_pair != min_pair:
-            selected.add(new_min_pair)
-            min_pair = new_min_pair
-
-    return selected
+    hash_arr = np.fromiter((h for h, _ in hashes), dtype=np.int64, count=n)
+    pos_arr = np.fromiter((p for _, p in hashes), dtype=np.int64, count=n)
+    out_h, out_p = winnow_arrays(hash_arr, pos_arr, w)
+    return set(zip(out_h.tolist(), out_p.tolist()))